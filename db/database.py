@@ -1,20 +1,273 @@
-from deltalake import DeltaTable, write_deltalake
-import pandas as pd
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+import json
 import os
+import tempfile
+import threading
+import time
 from pathlib import Path
 
+# deltalake, pandas e pyarrow são pesados de importar; cada método importa o
+# que precisa na primeira vez que é chamado, para a API subir mais rápido
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from deltalake import DeltaTable
+
+# Acima desta quantidade de pedaços o snapshot é compactado em um só
+SNAPSHOT_MAX_CHUNKS = 64
+
 class DeltaDatabase:
     """
     Classe para representar um banco de dados simples usando Delta Lake
     """
 
-    def __init__(self, table_path: str):
+    def __init__(
+        self,
+        table_path: str,
+        checkpoint_interval: int = 100,
+        log_retention_hours: int = 720,
+        snapshot_path: str | None = None,
+    ):
         self.path = Path(table_path)
         self.seq_file = self.path / ".seq"
+        self.log_dir = self.path / "_delta_log"
+        self.checkpoint_interval = checkpoint_interval
+        self.log_retention_hours = log_retention_hours
+        # Handle da tabela mantido entre chamadas e atualizado de forma incremental.
+        # O objeto do deltalake não aceita uso simultâneo entre threads, então
+        # todo acesso a ele passa pelo _table_lock (ver table())
+        self._table: DeltaTable | None = None
+        self._table_lock = threading.RLock()
+        # Reserva de IDs no .seq e o append correspondente acontecem juntos,
+        # já que a importação grava a partir do pool de threads do FastAPI
+        self._write_lock = threading.RLock()
         self.path.mkdir(parents=True, exist_ok=True)
         if not self.seq_file.exists():
             self.write_seq_file("0")
 
+        # Snapshot opcional em Arrow IPC, atualizado em segundo plano após as escritas.
+        # A thread do snapshot usa um handle próprio para não disputar o da API.
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._snapshot_table: DeltaTable | None = None
+        self._snapshot_cache: tuple[int, int, pa.Table] | None = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_pool = ThreadPoolExecutor(max_workers=1)
+        self._snapshot_future: Future | None = None
+        if self.snapshot_path is not None and self.table_exists():
+            self.schedule_snapshot_refresh()
+
+    def table_exists(self) -> bool:
+        return self.log_dir.exists() and any(self.log_dir.iterdir())
+
+    @contextmanager
+    def table(self):
+        """
+        Entrega o handle da tabela segurando o _table_lock, abrindo na primeira
+        chamada e aplicando apenas os commits novos nas chamadas seguintes.
+        O handle só pode ser usado dentro do bloco `with`.
+        """
+        from deltalake import DeltaTable
+
+        with self._table_lock:
+            if self._table is None:
+                self._table = DeltaTable(str(self.path))
+                # Uma tabela que nunca teve checkpoint já ganha um ao ser aberta
+                self.checkpoint_if_needed(self._table)
+            else:
+                self._table.update_incremental()
+            yield self._table
+
+    def version(self) -> int:
+        with self.table() as dt:
+            return dt.version()
+
+    def after_commit(self):
+        """
+        Cria um checkpoint quando houver `checkpoint_interval` commits desde o
+        último e remove os logs expirados, para que abrir a tabela não precise
+        reler todo o histórico
+        """
+        # O commit já foi feito: uma falha aqui não pode fazer a escrita parecer
+        # que falhou, senão quem chamou conta errado o que foi gravado
+        try:
+            with self.table() as dt:
+                self.checkpoint_if_needed(dt)
+        except Exception as e:
+            print(f"Erro ao criar checkpoint: {e}")
+        self.schedule_snapshot_refresh()
+
+    def last_checkpoint_version(self) -> int:
+        last_checkpoint = self.log_dir / "_last_checkpoint"
+        if not last_checkpoint.exists():
+            return 0
+        return int(json.loads(last_checkpoint.read_text())["version"])
+
+    def checkpoint_if_needed(self, dt: DeltaTable):
+        # Compara com o _last_checkpoint em vez de exigir que o nosso commit caia
+        # num múltiplo do intervalo, já que outro processo pode ter escrito antes
+        if self.checkpoint_interval <= 0:
+            return
+        if dt.version() - self.last_checkpoint_version() >= self.checkpoint_interval:
+            self.checkpoint(dt)
+
+    def checkpoint(self, dt: DeltaTable | None = None):
+        # Chamado com dt só de dentro de table(), que já segura o lock
+        if dt is None:
+            with self.table() as dt:
+                self.checkpoint(dt)
+            return
+        dt.create_checkpoint()
+        self.cleanup_logs(dt.version())
+
+    def cleanup_logs(self, checkpoint_version: int):
+        """
+        Remove os arquivos de log anteriores ao checkpoint que já passaram do
+        tempo de retenção (equivalente ao delta.logRetentionDuration)
+        """
+        limite = time.time() - self.log_retention_hours * 3600
+        for file in self.log_dir.iterdir():
+            prefixo = file.name.split(".", 1)[0]
+            if not prefixo.isdigit() or int(prefixo) >= checkpoint_version:
+                continue
+            if file.stat().st_mtime < limite:
+                os.remove(file)
+
+    def schedule_snapshot_refresh(self):
+        """
+        Agenda a atualização do snapshot; se já houver uma na fila ela vai
+        pegar a versão mais nova quando rodar, então não agenda outra
+        """
+        if self.snapshot_path is None:
+            return
+        future = self._snapshot_future
+        if future is None or future.running() or future.done():
+            self._snapshot_future = self._snapshot_pool.submit(self._refresh_snapshot_safe)
+
+    def wait_snapshot_refresh(self):
+        """Espera a atualização de snapshot que estiver agendada, se houver"""
+        future = self._snapshot_future
+        if future is not None:
+            future.result()
+
+    def close(self):
+        """Encerra a thread do snapshot, deixando terminar a atualização em andamento"""
+        self._snapshot_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _refresh_snapshot_safe(self):
+        try:
+            self.refresh_snapshot()
+        except Exception as e:
+            print(f"Erro ao atualizar snapshot: {e}")
+
+    def read_snapshot_metadata(self) -> tuple[int, list[str]] | None:
+        import pyarrow as pa
+
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return None
+        metadata = pa.ipc.open_file(pa.memory_map(str(self.snapshot_path))).schema.metadata or {}
+        if b"delta_version" not in metadata:
+            return None
+        return int(metadata[b"delta_version"]), json.loads(metadata[b"delta_files"])
+
+    def refresh_snapshot(self):
+        """
+        Atualiza o arquivo de snapshot para a última versão da tabela. Se desde
+        o snapshot anterior só houve appends, lê apenas os arquivos novos;
+        senão reconstrói tudo. O arquivo é trocado de forma atômica, então
+        quem já mapeou a versão anterior continua com uma visão consistente.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        from deltalake import DeltaTable
+
+        with self._snapshot_lock:
+            if self._snapshot_table is None:
+                self._snapshot_table = DeltaTable(str(self.path))
+            else:
+                self._snapshot_table.update_incremental()
+            dt = self._snapshot_table
+
+            version = dt.version()
+            files = dt.files()
+            anterior = self.read_snapshot_metadata()
+            if anterior is not None and anterior[0] == version:
+                return
+
+            if anterior is not None and set(anterior[1]).issubset(files):
+                arquivos_anteriores = set(anterior[1])
+                novos = [str(self.path / f) for f in files if f not in arquivos_anteriores]
+                base = self.read_snapshot()
+                novos_dados = ds.dataset(novos, schema=base.schema, format="parquet").to_table()
+                tabela = pa.concat_tables([base, novos_dados])
+            else:
+                tabela = dt.to_pyarrow_table()
+
+            if tabela.num_columns and tabela.column(0).num_chunks > SNAPSHOT_MAX_CHUNKS:
+                tabela = tabela.combine_chunks()
+
+            metadata = {
+                **(tabela.schema.metadata or {}),
+                b"delta_version": str(version).encode(),
+                b"delta_files": json.dumps(files).encode(),
+            }
+            tabela = tabela.replace_schema_metadata(metadata)
+
+            # Nome único por escrita: outros processos podem estar atualizando ao mesmo tempo
+            fd, temp_path = tempfile.mkstemp(
+                dir=self.snapshot_path.parent, prefix=self.snapshot_path.name + ".", suffix=".tmp"
+            )
+            os.close(fd)
+            try:
+                with pa.OSFile(temp_path, "wb") as sink:
+                    with pa.ipc.new_file(sink, tabela.schema) as writer:
+                        writer.write_table(tabela)
+                os.replace(temp_path, self.snapshot_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+    def read_snapshot(self) -> pa.Table | None:
+        """
+        Abre o snapshot com memory map (sem cópia). O resultado fica em cache
+        até o arquivo ser trocado por uma versão nova.
+        """
+        snapshot = self._load_snapshot()
+        return snapshot[1] if snapshot is not None else None
+
+    def _load_snapshot(self) -> tuple[int, pa.Table] | None:
+        import pyarrow as pa
+
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return None
+        mtime = self.snapshot_path.stat().st_mtime_ns
+        cache = self._snapshot_cache
+        if cache is None or cache[0] != mtime:
+            source = pa.memory_map(str(self.snapshot_path))
+            tabela = pa.ipc.open_file(source).read_all()
+            version = int(tabela.schema.metadata[b"delta_version"])
+            cache = self._snapshot_cache = (mtime, version, tabela)
+        return cache[1], cache[2]
+
+    def read_table(self, allow_stale: bool = False) -> pa.Table:
+        """
+        Leitura só para consulta. Usa o snapshot quando ele está na mesma
+        versão da tabela Delta (inclusive commits de outros processos); se
+        estiver atrasado, lê a tabela direto e agenda a atualização.
+        Com allow_stale=True aceita um snapshot desatualizado.
+        """
+        snapshot = self._load_snapshot()
+        if snapshot is not None:
+            version, tabela = snapshot
+            if allow_stale or version == self.version():
+                return tabela
+            self.schedule_snapshot_refresh()
+        with self.table() as dt:
+            return dt.to_pyarrow_table()
+
     def read_seq_file(self) -> int:
         return int(self.seq_file.read_text().strip() or 0)
     
@@ -23,48 +276,86 @@ class DeltaDatabase:
         self.seq_file.write_text(str(int(value)))
     
     def get_next_id(self) -> int:
-        current_id = self.read_seq_file() + 1
-        self.write_seq_file(current_id)
-        return current_id
+        with self._write_lock:
+            current_id = self.read_seq_file() + 1
+            self.write_seq_file(current_id)
+            return current_id
     
     def insert(self, data: dict):
-        current_id = self.get_next_id()
-        data["id"] = current_id
-        df = pd.DataFrame([data])
+        import pandas as pd
+        from deltalake import write_deltalake
 
-        if not any(self.path.iterdir()):
-            write_deltalake(str(self.path), df)
-        else:
+        with self._write_lock:
+            current_id = self.get_next_id()
+            data["id"] = current_id
+            df = pd.DataFrame([data])
+
+            # Grava pelo caminho, com um handle próprio do write_deltalake, para não
+            # segurar o _table_lock (e bloquear as leituras) durante a escrita
             write_deltalake(str(self.path), df, mode="append")
+        self.after_commit()
         
         return current_id
+
+    def insert_many(self, df: pd.DataFrame) -> tuple[int, int] | None:
+        """
+        Insere vários registros em um único commit, reservando um bloco
+        contínuo de IDs no arquivo .seq. Só levanta exceção se o commit não
+        aconteceu.
+        """
+        from deltalake import write_deltalake
+
+        if df.empty:
+            return None
+
+        with self._write_lock:
+            first_id = self.read_seq_file() + 1
+            last_id = first_id + len(df) - 1
+            self.write_seq_file(last_id)
+            df = df.assign(id=range(first_id, last_id + 1))
+
+            # Grava pelo caminho, com um handle próprio do write_deltalake, para não
+            # segurar o _table_lock (e bloquear as leituras) durante a escrita
+            write_deltalake(str(self.path), df, mode="append")
+        self.after_commit()
+
+        return first_id, last_id
     
     def get_by_id(self, record_id: int) -> dict | None:
-        dt = DeltaTable(self.path)
-        df = dt.to_pandas()
+        with self.table() as dt:
+            df = dt.to_pandas()
         record = df[df["id"] == record_id]
         if not record.empty:
             return record.iloc[0].to_dict()
     
     def read(self, path: str):
+        from deltalake import DeltaTable
+
         df = DeltaTable(path).to_pandas()
         print(df)
     
     def update(self, update_id: int, new_data: dict):
-        df = DeltaTable(self.path).to_pandas()
-
-        if update_id in df["id"].values:
-            for col, value in new_data.items():
-                if col in df.columns:
-                    df.loc[df["id"] == update_id, col] = value
-                else:
-                    raise ValueError(f"Coluna '{col}' não existe na tabela.")
-            write_deltalake(self.path, df, mode="overwrite")
-        else:
-            raise ValueError(f"ID '{update_id}' não encontrado na tabela.")
+        from deltalake import write_deltalake
+
+        # O overwrite regrava a tabela inteira, então não pode correr junto de um append
+        with self._write_lock:
+            with self.table() as dt:
+                df = dt.to_pandas()
+
+            if update_id in df["id"].values:
+                for col, value in new_data.items():
+                    if col in df.columns:
+                        df.loc[df["id"] == update_id, col] = value
+                    else:
+                        raise ValueError(f"Coluna '{col}' não existe na tabela.")
+                write_deltalake(str(self.path), df, mode="overwrite")
+            else:
+                raise ValueError(f"ID '{update_id}' não encontrado na tabela.")
+        self.after_commit()
     
     def delete(self, delete_id: int):
-        df = DeltaTable(self.path).to_pandas()
+        with self.table() as dt:
+            df = dt.to_pandas()
 
         if delete_id in df["id"].values:
             df = df[df["id"] != delete_id]
@@ -74,29 +365,31 @@ class DeltaDatabase:
                 for file in self.path.iterdir():
                     if file.is_file():
                         os.remove(file)
+                with self._table_lock:
+                    self._table = None
                 print("Todos os registros foram deletados. Tabela removida.")
         else:
             raise ValueError(f"ID '{delete_id}' não encontrado na tabela.")
     
     def count(self) -> int:
-        if not any(self.path.iterdir()):
+        if not self.table_exists():
             return 0
         
         try:
-            dt = DeltaTable(self.path)
-            return len(dt.to_pandas())
+            with self.table() as dt:
+                return len(dt.to_pandas())
         except Exception as e:
             print(f"Erro ao contar registros: {e}")
             return 0
     
     def vacuum(self):
-        if not any(self.path.iterdir()):
+        if not self.table_exists():
             print("Tabela não existe ou está vazia.")
             return
         
         try:
-            dt = DeltaTable(self.path)
-            dt.vacuum(retention_hours=0)
+            with self.table() as dt:
+                dt.vacuum(retention_hours=0)
         except Exception as e:
             print(f"Erro ao executar vacuum: {e}")
 
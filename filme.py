@@ -1,4 +1,5 @@
 from datetime import datetime
+
 class GerenciadorFilmes:
     @staticmethod
     def pegar_campos_para_csv():
@@ -18,6 +19,67 @@ class GerenciadorFilmes:
         ]
         return campos
 
+    @staticmethod
+    def converter_inteiro(valor):
+        """Converte com int(), devolvendo None quando o valor não serve"""
+        try:
+            return int(valor)
+        except (ValueError, TypeError):
+            return None
+
+    @staticmethod
+    def preparar_lote(df):
+        """Deixa um DataFrame importado só com os campos do filme, já nos tipos certos"""
+        import pandas as pd
+
+        lote = df.reindex(columns=GerenciadorFilmes.pegar_campos_para_csv())
+        for campo in lote.columns:
+            if campo in ('ano', 'tempo_minutos'):
+                # Mesma conversão de criar_apartir_dict: "2000.0" não vira 2000
+                lote[campo] = pd.to_numeric(lote[campo].map(GerenciadorFilmes.converter_inteiro))
+            else:
+                lote[campo] = lote[campo].fillna('').astype(str)
+
+        sem_data = lote['quando_cadastrou'].str.strip() == ''
+        lote.loc[sem_data, 'quando_cadastrou'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return lote
+
+    @staticmethod
+    def validar_lote(lote):
+        """
+        Aplica as regras de Filme.validar_informacoes coluna por coluna e
+        devolve os problemas só das linhas inválidas, indexados pela linha
+        """
+        import pandas as pd
+
+        ano = lote['ano']
+        tempo = lote['tempo_minutos'].fillna(0)
+        ano_limite = datetime.now().year + 2
+        # Como no validar_informacoes, os limites só valem quando há ano informado
+        tem_ano = ano.notna() & (ano != 0)
+
+        def vazio(campo):
+            return lote[campo].str.strip() == ''
+
+        regras = [
+            (vazio('titulo_brasil'), "❌ Precisa ter um título em português"),
+            (ano.isna() | (ano == 0), "❌ Ano de lançamento é obrigatório"),
+            (tem_ano & (ano < 1880), "❌ Ano muito antigo (antes de 1880)"),
+            (tem_ano & (ano > ano_limite), "❌ Ano no futuro muito distante"),
+            (vazio('direcao'), "❌ Nome do diretor é obrigatório"),
+            (vazio('categoria'), "❌ Gênero do filme é obrigatório"),
+            (tempo <= 0, "❌ Duração precisa ser maior que zero"),
+            (tempo > 600, "❌ Duração muito longa (mais de 10 horas)"),
+            (vazio('nacionalidade'), "❌ País de origem é obrigatório"),
+        ]
+
+        # Uma coluna por regra; só as linhas com alguma falha viram lista de problemas
+        falhas = pd.DataFrame({mensagem: mascara for mascara, mensagem in regras})
+        falhas = falhas[falhas.any(axis=1)]
+        if falhas.empty:
+            return pd.Series(dtype=object)
+        return falhas.apply(lambda linha: list(linha.index[linha]), axis=1)
+
     @staticmethod
     def criar_exemplo():
         """Monta um filme de exemplo pra testar o sistema"""
@@ -131,10 +193,7 @@ class Filme:
             novo_filme.titulo_original = dados['titulo_original']
 
         if 'ano' in dados:
-            try:
-                novo_filme.ano = int(dados['ano'])
-            except (ValueError, TypeError):
-                novo_filme.ano = None
+            novo_filme.ano = GerenciadorFilmes.converter_inteiro(dados['ano'])
 
         if 'direcao' in dados:
             novo_filme.direcao = dados['direcao']
@@ -146,10 +205,8 @@ class Filme:
             novo_filme.categoria = dados['categoria']
 
         if 'tempo_minutos' in dados:
-            try:
-                novo_filme.tempo_minutos = int(dados['tempo_minutos'])
-            except (ValueError, TypeError):
-                novo_filme.tempo_minutos = 0
+            tempo_minutos = GerenciadorFilmes.converter_inteiro(dados['tempo_minutos'])
+            novo_filme.tempo_minutos = tempo_minutos if tempo_minutos is not None else 0
 
         if 'nacionalidade' in dados:
             novo_filme.nacionalidade = dados['nacionalidade']
@@ -1,19 +1,139 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+import time
+
+# Marca o início da importação para medir o tempo de inicialização
+INICIO_PROCESSO = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import pandas as pd
+from typing import Optional, Dict, Any, List
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import os
 import zipfile
 import io
 import hashlib
-from deltalake import DeltaTable
+import json
 from db.database import DeltaDatabase
-from filme import Filme
+from filme import Filme, GerenciadorFilmes
+
+# deltalake, pandas e pyarrow não são importados aqui nem no lifespan: o
+# aquecimento importa e abre a tabela em outra thread, com a API já aceitando
+# requisições e o /pronto/ respondendo 503 até terminar. Sem aquecimento, a
+# primeira rota que precisar faz isso.
+
+# Criado no lifespan; criar o DeltaDatabase não abre a tabela
+db: Optional[DeltaDatabase] = None
+
+# Aquecimento opcional (API_AQUECER=0 desliga): carrega bibliotecas e snapshot em segundo plano
+AQUECER_NA_INICIALIZACAO = os.environ.get("API_AQUECER", "1") != "0"
+
+# Medições de inicialização, expostas em /pronto/
+metricas_inicializacao: Dict[str, Any] = {
+    "pronto": False,
+    "tempo_importacao_ms": None,
+    "tempo_abertura_tabela_ms": None,
+    "tempo_ate_aceitar_requisicoes_ms": None,
+    "tempo_aquecimento_ms": None,
+    "tempo_primeira_requisicao_ms": None,
+    "rota_primeira_requisicao": None,
+}
+
+def milissegundos_desde(inicio: float) -> float:
+    return round((time.perf_counter() - inicio) * 1000, 2)
+
+def aquecer():
+    """Abre a tabela, importa pandas/pyarrow e prepara o snapshot antes de a API ser dada como pronta"""
+    inicio = time.perf_counter()
+    try:
+        if db.table_exists():
+            # Importa o deltalake, abre a tabela e cria o checkpoint se estiver faltando
+            db.version()
+            metricas_inicializacao["tempo_abertura_tabela_ms"] = milissegundos_desde(inicio)
+
+        import pandas  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+
+        if db.table_exists():
+            # O DeltaDatabase já agenda a atualização do snapshot ao abrir; só espera por ela
+            db.wait_snapshot_refresh()
+            db.read_table()
+    except Exception as e:
+        print(f"Erro no aquecimento: {e}")
+
+    metricas_inicializacao["tempo_aquecimento_ms"] = milissegundos_desde(inicio)
+    metricas_inicializacao["pronto"] = True
+    print(f"Aquecimento concluído em {metricas_inicializacao['tempo_aquecimento_ms']} ms")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db, pool_hash
+    pool_hash = ThreadPoolExecutor()
+    # Inicializa o banco de dados Delta, com um snapshot Arrow para as leituras.
+    # A tabela só é aberta no aquecimento ou na primeira rota que usar
+    db = DeltaDatabase("data/filmes", snapshot_path="data/filmes.arrow")
+
+    if AQUECER_NA_INICIALIZACAO:
+        aquecimento = asyncio.get_running_loop().run_in_executor(None, aquecer)
+    else:
+        aquecimento = None
+        metricas_inicializacao["pronto"] = True
+
+    # Fim do startup do lifespan: a partir daqui o servidor aceita requisições
+    metricas_inicializacao["tempo_ate_aceitar_requisicoes_ms"] = milissegundos_desde(INICIO_PROCESSO)
+    print(f"API iniciada em {metricas_inicializacao['tempo_ate_aceitar_requisicoes_ms']} ms")
+    yield
+    if aquecimento is not None:
+        await aquecimento
+    db.close()
+    pool_hash.shutdown()
+
+class MedirPrimeiraRequisicao:
+    """
+    Middleware ASGI que mede só a primeira requisição (até o último pedaço do
+    corpo, então vale também para respostas em streaming) e depois vira um
+    repasse direto para a aplicação
+    """
+    def __init__(self, app):
+        self.app = app
+        self.medido = False
+
+    async def __call__(self, scope, receive, send):
+        # A sonda de prontidão não conta como primeira requisição
+        if self.medido or scope["type"] != "http" or scope["path"] == "/pronto/":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+
+        async def send_medindo(message):
+            await send(message)
+            fim_do_corpo = message["type"] == "http.response.body" and not message.get("more_body", False)
+            if fim_do_corpo and not self.medido:
+                self.medido = True
+                metricas_inicializacao["tempo_primeira_requisicao_ms"] = milissegundos_desde(inicio)
+                metricas_inicializacao["rota_primeira_requisicao"] = scope["path"]
+                print(f"Primeira requisição ({scope['path']}) em {metricas_inicializacao['tempo_primeira_requisicao_ms']} ms")
 
-app = FastAPI(title="API de Filmes", version="1.0.0")
+        await self.app(scope, receive, send_medindo)
 
-# Inicializa o banco de dados Delta
-db = DeltaDatabase("data/filmes")
+app = FastAPI(title="API de Filmes", version="1.0.0", lifespan=lifespan)
+app.add_middleware(MedirPrimeiraRequisicao)
+
+# Importação em lotes: linhas lidas por vez e linhas gravadas por commit
+TAMANHO_CHUNK = 10_000
+LINHAS_POR_COMMIT = 200_000
+MAX_REJEITADOS_RESUMO = 100
+
+# Hash em lote: o hashlib só libera o GIL para dados a partir de 2048 bytes,
+# então só esses vão para o pool, divididos em fatias de ~1 MB
+FUNCOES_HASH = {"md5": hashlib.md5, "sha1": hashlib.sha1, "sha256": hashlib.sha256}
+BYTES_MINIMO_SEM_GIL = 2048
+BYTES_POR_FATIA_HASH = 1024 * 1024
+# Criado no lifespan e encerrado no desligamento da API
+pool_hash: Optional[ThreadPoolExecutor] = None
 
 # Modelo Pydantic para validação dos dados de filme
 class FilmeCreate(BaseModel):
@@ -48,6 +168,10 @@ class HashRequest(BaseModel):
     dado: str
     funcao_hash: str  # "md5", "sha1", "sha256"
 
+class HashLoteRequest(BaseModel):
+    dados: List[str]
+    funcao_hash: str  # "md5", "sha1", "sha256"
+
 class PaginacaoRequest(BaseModel):
     pagina: int 
     tamanho_pagina: int
@@ -78,21 +202,23 @@ async def criar_filme(filme: FilmeCreate):
 async def listar_filmes_paginados(paginacao: PaginacaoRequest):
     """F2: Retornar filmes com paginação"""
     try:
-        # Carrega todos os dados
-        dt = DeltaTable(str(db.path))
-        df = dt.to_pandas()
+        # Lê o snapshot mapeado em memória e só converte a página pedida
+        tabela = db.read_table()
         
         # Calcula índices para paginação
         inicio = (paginacao.pagina - 1) * paginacao.tamanho_pagina
-        fim = inicio + paginacao.tamanho_pagina
         
         # Aplica paginação
-        df_paginado = df.iloc[inicio:fim]
+        if inicio < 0:
+            inicio, tamanho = 0, 0
+        else:
+            tamanho = paginacao.tamanho_pagina
+        df_paginado = tabela.slice(inicio, tamanho).to_pandas()
         
         return {
             "pagina": paginacao.pagina,
             "tamanho_pagina": paginacao.tamanho_pagina,
-            "total_filmes": len(df),
+            "total_filmes": tabela.num_rows,
             "filmes": df_paginado.to_dict('records')
         }
     except Exception as e:
@@ -105,8 +231,7 @@ async def listar_filmes_paginados(paginacao: PaginacaoRequest):
 async def listar_filmes():
     """Listar todos os filmes"""
     try:
-        dt = DeltaTable(str(db.path))
-        df = dt.to_pandas()
+        df = db.read_table().to_pandas()
         return {"filmes": df.to_dict('records')}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar filmes: {str(e)}")
@@ -188,8 +313,7 @@ async def contar_filmes():
 async def exportar_filmes():
     """F5: Exportar todos os filmes como CSV compactado via streaming"""
     try:
-        dt = DeltaTable(str(db.path))
-        df = dt.to_pandas()
+        df = db.read_table().to_pandas()
         
         # Cria um buffer em memória para o ZIP
         zip_buffer = io.BytesIO()
@@ -212,6 +336,157 @@ async def exportar_filmes():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao exportar filmes: {str(e)}")
 
+def ler_upload_em_chunks(arquivo: UploadFile, formato: str):
+    """Lê o arquivo enviado em pedaços de TAMANHO_CHUNK linhas, sem carregar tudo na memória"""
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    if formato == "csv":
+        with pd.read_csv(arquivo.file, chunksize=TAMANHO_CHUNK, dtype=str, keep_default_na=False) as leitor:
+            yield from leitor
+    elif formato == "zip":
+        with zipfile.ZipFile(arquivo.file) as zip_file:
+            nomes_csv = [nome for nome in zip_file.namelist() if nome.lower().endswith(".csv")]
+            if not nomes_csv:
+                raise HTTPException(status_code=400, detail="O arquivo ZIP não contém nenhum CSV")
+            with zip_file.open(nomes_csv[0]) as csv_file:
+                with pd.read_csv(csv_file, chunksize=TAMANHO_CHUNK, dtype=str, keep_default_na=False) as leitor:
+                    yield from leitor
+    elif formato in ("ndjson", "jsonl"):
+        with pd.read_json(arquivo.file, lines=True, chunksize=TAMANHO_CHUNK, dtype=False) as leitor:
+            yield from leitor
+    elif formato == "parquet":
+        arquivo_parquet = pq.ParquetFile(arquivo.file)
+        colunas = [c for c in GerenciadorFilmes.pegar_campos_para_csv() if c in arquivo_parquet.schema_arrow.names]
+        for batch in arquivo_parquet.iter_batches(batch_size=TAMANHO_CHUNK, columns=colunas):
+            yield batch.to_pandas()
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Formato não suportado. Use: csv, zip, ndjson ou parquet"
+        )
+
+# Importar dados de CSV (puro ou compactado), NDJSON ou parquet
+# Rota síncrona de propósito: o FastAPI roda em outra thread e o parsing não trava a API
+@app.post("/filmes/importar/")
+def importar_filmes(arquivo: UploadFile = File(...), formato: Optional[str] = None):
+    """
+    Importar filmes em lotes, validando cada pedaço e gravando os aceitos em commits grandes.
+
+    A importação não é atômica: se o arquivo der erro no meio, os commits já
+    feitos continuam na tabela. A resposta de erro traz `total_inserido`,
+    `commits` e `ultima_linha_gravada` (tudo até essa linha foi gravado ou
+    rejeitado), para o cliente retomar dali sem duplicar filmes.
+    """
+    import pandas as pd
+
+    formato = (formato or Path(arquivo.filename or "").suffix.lstrip(".")).lower()
+    resumo = {
+        "total_lido": 0,
+        "total_inserido": 0,
+        "total_rejeitado": 0,
+        "commits": 0,
+        "ultima_linha_gravada": 0,
+        "rejeitados": []
+    }
+    pendentes = []
+    linhas_pendentes = 0
+
+    def gravar_pendentes():
+        nonlocal pendentes, linhas_pendentes
+        # Erro ao gravar é problema do servidor/tabela, não do arquivo: vira 500
+        # aqui para não cair no "Arquivo inválido" dos erros de leitura
+        try:
+            db.insert_many(pd.concat(pendentes, ignore_index=True))
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail={"mensagem": f"Erro ao gravar filmes: {str(e)}", **resumo}
+            )
+        resumo["commits"] += 1
+        resumo["total_inserido"] += linhas_pendentes
+        resumo["ultima_linha_gravada"] = resumo["total_lido"]
+        pendentes, linhas_pendentes = [], 0
+
+    try:
+        for chunk in ler_upload_em_chunks(arquivo, formato):
+            lote = GerenciadorFilmes.preparar_lote(chunk.reset_index(drop=True))
+            problemas = GerenciadorFilmes.validar_lote(lote)
+
+            for posicao, lista in problemas.items():
+                if len(resumo["rejeitados"]) >= MAX_REJEITADOS_RESUMO:
+                    break
+                resumo["rejeitados"].append({"linha": resumo["total_lido"] + posicao + 1, "problemas": lista})
+            resumo["total_rejeitado"] += len(problemas)
+            resumo["total_lido"] += len(lote)
+
+            aceitos = lote.drop(index=problemas.index).astype({"ano": "int64", "tempo_minutos": "int64"})
+            pendentes.append(aceitos)
+            linhas_pendentes += len(aceitos)
+
+            # Junta vários chunks antes de gravar para não gerar um commit por pedaço
+            if linhas_pendentes >= LINHAS_POR_COMMIT:
+                gravar_pendentes()
+
+        if linhas_pendentes:
+            gravar_pendentes()
+        else:
+            resumo["ultima_linha_gravada"] = resumo["total_lido"]
+
+        return {"mensagem": "Importação concluída", **resumo}
+    except HTTPException:
+        raise
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"mensagem": f"Arquivo inválido: {str(e)}", **resumo}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={"mensagem": f"Erro ao importar filmes: {str(e)}", **resumo}
+        )
+
+def pegar_funcao_hash(nome: str):
+    funcao = FUNCOES_HASH.get(nome.lower())
+    if funcao is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Função hash não suportada. Use: md5, sha1 ou sha256"
+        )
+    return funcao
+
+def calcular_hashes(dados: List[bytes], funcao) -> List[str]:
+    """
+    Calcula o hash de cada item. Itens pequenos são calculados direto, já que
+    seguram o GIL; os grandes vão para o pool em fatias de BYTES_POR_FATIA_HASH
+    """
+    hashes = [None] * len(dados)
+    fatias = []
+    fatia = []
+    bytes_fatia = 0
+    for posicao, dado in enumerate(dados):
+        if len(dado) < BYTES_MINIMO_SEM_GIL:
+            hashes[posicao] = funcao(dado).hexdigest()
+            continue
+        fatia.append(posicao)
+        bytes_fatia += len(dado)
+        if bytes_fatia >= BYTES_POR_FATIA_HASH:
+            fatias.append(fatia)
+            fatia, bytes_fatia = [], 0
+    if fatia:
+        fatias.append(fatia)
+
+    def hash_fatia(posicoes):
+        return [(posicao, funcao(dados[posicao]).hexdigest()) for posicao in posicoes]
+
+    # Com uma fatia só não há o que paralelizar
+    resultados = map(hash_fatia, fatias) if len(fatias) <= 1 else pool_hash.map(hash_fatia, fatias)
+    for resultado in resultados:
+        for posicao, hash_dado in resultado:
+            hashes[posicao] = hash_dado
+    return hashes
+
 # F6: Calcular hash
 @app.post("/hash/")
 async def calcular_hash(hash_request: HashRequest):
@@ -219,31 +494,102 @@ async def calcular_hash(hash_request: HashRequest):
     try:
         dado = hash_request.dado.encode('utf-8')
         funcao = hash_request.funcao_hash.lower()
-        
-        if funcao == "md5":
-            hash_resultado = hashlib.md5(dado).hexdigest()
-        elif funcao == "sha1":
-            hash_resultado = hashlib.sha1(dado).hexdigest()
-        elif funcao == "sha256":
-            hash_resultado = hashlib.sha256(dado).hexdigest()
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail="Função hash não suportada. Use: md5, sha1 ou sha256"
-            )
+        hash_resultado = pegar_funcao_hash(funcao)(dado).hexdigest()
         
         return {
             "dado": hash_request.dado,
             "funcao_hash": funcao,
             "hash": hash_resultado
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao calcular hash: {str(e)}")
+
+# Hash de uma lista de dados em uma única requisição
+@app.post("/hash/lote/")
+def calcular_hash_lote(hash_request: HashLoteRequest):
+    """Calcular o hash de vários dados de uma vez, na mesma ordem da lista enviada"""
+    try:
+        funcao = pegar_funcao_hash(hash_request.funcao_hash)
+        dados = [dado.encode('utf-8') for dado in hash_request.dados]
+        return {
+            "funcao_hash": hash_request.funcao_hash.lower(),
+            "total": len(dados),
+            "hashes": calcular_hashes(dados, funcao)
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao calcular hash: {str(e)}")
 
+# Hash de um arquivo enviado, um dado por linha, devolvido via streaming
+@app.post("/hash/arquivo/")
+def calcular_hash_arquivo(funcao_hash: str, arquivo: UploadFile = File(...)):
+    """Calcular o hash de cada linha do arquivo, devolvendo um hash por linha"""
+    funcao = pegar_funcao_hash(funcao_hash)
+
+    def gerar_hashes():
+        bloco = []
+        for linha in arquivo.file:
+            bloco.append(linha.rstrip(b"\r\n"))
+            if len(bloco) >= TAMANHO_CHUNK:
+                yield "".join(h + "\n" for h in calcular_hashes(bloco, funcao))
+                bloco = []
+        if bloco:
+            yield "".join(h + "\n" for h in calcular_hashes(bloco, funcao))
+
+    return StreamingResponse(gerar_hashes(), media_type="text/plain")
+
+# Hash do conteúdo de cada filme direto da tabela, para detectar alterações
+@app.get("/filmes/hashes/")
+def calcular_hash_filmes(funcao_hash: str = "sha256"):
+    """Calcular um hash por filme a partir de todas as colunas, exceto o ID"""
+    try:
+        funcao = pegar_funcao_hash(funcao_hash)
+        # O dataset do pyarrow não depende mais do handle, então o lock só
+        # precisa cobrir a montagem dele
+        with db.table() as dt:
+            colunas = [campo.name for campo in dt.schema().fields if campo.name != "id"]
+            versao = dt.version()
+            dataset = dt.to_pyarrow_dataset()
+
+        hashes = []
+        for batch in dataset.to_batches(columns=["id"] + colunas):
+            ids = batch.column("id").to_pylist()
+            linhas = batch.select(colunas).to_pylist()
+            # Cada filme vira uma lista JSON dos valores: sem separador que possa
+            # aparecer nos dados, e null continua diferente do texto "None"
+            dados = [
+                json.dumps([linha[coluna] for coluna in colunas], ensure_ascii=False, default=str).encode('utf-8')
+                for linha in linhas
+            ]
+            for filme_id, hash_filme in zip(ids, calcular_hashes(dados, funcao)):
+                hashes.append({"id": filme_id, "hash": hash_filme})
+
+        return {
+            "funcao_hash": funcao_hash.lower(),
+            "versao": versao,
+            "total_filmes": len(hashes),
+            "hashes": hashes
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao calcular hash dos filmes: {str(e)}")
+
 @app.get("/")
 async def root():
     return {"mensagem": "API de Filmes - Delta Database", "version": "1.0.0"}
 
+# Prontidão: só responde 200 depois do aquecimento, com as medições de inicialização
+@app.get("/pronto/")
+async def pronto():
+    status_code = 200 if metricas_inicializacao["pronto"] else 503
+    return JSONResponse(status_code=status_code, content=metricas_inicializacao)
+
+metricas_inicializacao["tempo_importacao_ms"] = milissegundos_desde(INICIO_PROCESSO)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,78 @@
+import threading
+
+import pandas as pd
+
+from db.database import DeltaDatabase
+
+
+FILME = {
+    "titulo_brasil": "Cidade de Deus",
+    "ano": 2002,
+    "direcao": "Fernando Meirelles",
+    "categoria": "Drama",
+    "tempo_minutos": 130,
+    "nacionalidade": "Brasil",
+}
+
+
+def test_escrita_e_leituras_simultaneas_no_mesmo_handle(tmp_path):
+    db = DeltaDatabase(str(tmp_path / "filmes"), checkpoint_interval=10)
+    db.insert(dict(FILME))
+
+    erros = []
+    escrevendo = threading.Event()
+    escrevendo.set()
+
+    def escritor():
+        try:
+            for _ in range(40):
+                db.insert_many(pd.DataFrame([FILME] * 5))
+        except Exception as e:
+            erros.append(e)
+        finally:
+            escrevendo.clear()
+
+    def leitor():
+        try:
+            while escrevendo.is_set():
+                db.count()
+                db.read_table()
+                with db.table() as dt:
+                    dt.to_pyarrow_dataset()
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=escritor)] + [threading.Thread(target=leitor) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    ids = db.read_table().column("id").to_pylist()
+    assert len(ids) == 1 + 40 * 5
+    assert len(set(ids)) == len(ids)
+    assert db.last_checkpoint_version() > 0
+
+
+def test_insert_e_insert_many_em_threads_nao_repetem_ids(tmp_path):
+    db = DeltaDatabase(str(tmp_path / "filmes"))
+
+    def inserir_um():
+        for _ in range(10):
+            db.insert(dict(FILME))
+
+    def inserir_lote():
+        for _ in range(5):
+            db.insert_many(pd.DataFrame([FILME] * 20))
+
+    threads = [threading.Thread(target=alvo) for alvo in (inserir_um, inserir_um, inserir_lote)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = db.read_table().column("id").to_pylist()
+    assert len(ids) == 20 + 100
+    assert sorted(ids) == list(range(1, 121))
+    assert db.read_seq_file() == 120
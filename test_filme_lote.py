@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from filme import Filme, GerenciadorFilmes
+
+
+def filme_valido(**alteracoes):
+    dados = {
+        "titulo_brasil": "Cidade de Deus",
+        "ano": "2002",
+        "direcao": "Fernando Meirelles",
+        "categoria": "Drama",
+        "tempo_minutos": "130",
+        "nacionalidade": "Brasil",
+    }
+    dados.update(alteracoes)
+    return dados
+
+
+CASOS = [
+    filme_valido(),
+    filme_valido(titulo_brasil=""),
+    filme_valido(titulo_brasil="   "),
+    filme_valido(ano="0"),
+    filme_valido(ano=""),
+    filme_valido(ano="1879"),
+    filme_valido(ano="1880"),
+    filme_valido(ano=str(datetime.now().year + 3)),
+    filme_valido(ano="2000.0"),
+    filme_valido(ano="dois mil"),
+    filme_valido(tempo_minutos="0"),
+    filme_valido(tempo_minutos="601"),
+    filme_valido(tempo_minutos="600"),
+    filme_valido(tempo_minutos="90.0"),
+    filme_valido(direcao="", categoria="", nacionalidade=""),
+    filme_valido(ano="0", tempo_minutos="0", titulo_brasil=""),
+]
+
+
+def problemas_em_lote(linhas):
+    lote = GerenciadorFilmes.preparar_lote(pd.DataFrame(linhas))
+    problemas = GerenciadorFilmes.validar_lote(lote)
+    return [problemas.get(posicao, []) for posicao in range(len(linhas))]
+
+
+def test_validar_lote_concorda_com_validar_informacoes():
+    esperado = [Filme.criar_apartir_dict(linha).validar_informacoes() for linha in CASOS]
+    assert problemas_em_lote(CASOS) == esperado
+
+
+@pytest.mark.parametrize("ano", [2000.0, 2000.5, None, 0, 1879])
+def test_validar_lote_com_valores_numericos(ano):
+    # NDJSON e parquet entregam números em vez de texto
+    linha = filme_valido(ano=ano, tempo_minutos=90)
+    esperado = Filme.criar_apartir_dict(linha).validar_informacoes()
+    assert problemas_em_lote([linha]) == [esperado]
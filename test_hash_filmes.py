@@ -0,0 +1,38 @@
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import main
+from db.database import DeltaDatabase
+
+
+def hashes_por_id(tmp_path, monkeypatch, linhas):
+    db = DeltaDatabase(str(tmp_path / "filmes"))
+    db.insert_many(pd.DataFrame(linhas))
+    monkeypatch.setattr(main, "db", db)
+    resposta = TestClient(main.app).get("/filmes/hashes/")
+    assert resposta.status_code == 200
+    return [item["hash"] for item in sorted(resposta.json()["hashes"], key=lambda item: item["id"])]
+
+
+def test_hash_nao_confunde_separador_dentro_dos_campos(tmp_path, monkeypatch):
+    primeiro, segundo = hashes_por_id(tmp_path, monkeypatch, [
+        {"titulo_brasil": "a\x1fb", "direcao": "c"},
+        {"titulo_brasil": "a", "direcao": "b\x1fc"},
+    ])
+    assert primeiro != segundo
+
+
+def test_hash_diferencia_nulo_do_texto_none(tmp_path, monkeypatch):
+    primeiro, segundo = hashes_por_id(tmp_path, monkeypatch, [
+        {"titulo_brasil": "Filme", "resumo": None},
+        {"titulo_brasil": "Filme", "resumo": "None"},
+    ])
+    assert primeiro != segundo
+
+
+def test_hash_igual_para_conteudo_igual(tmp_path, monkeypatch):
+    primeiro, segundo = hashes_por_id(tmp_path, monkeypatch, [
+        {"titulo_brasil": "Filme", "resumo": "x"},
+        {"titulo_brasil": "Filme", "resumo": "x"},
+    ])
+    assert primeiro == segundo